@@ -6,6 +6,8 @@ import sys
 import argparse
 from typing import Dict, Any, Tuple, Optional, List
 
+from bulk import add_bulk_arguments, run_bulk
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("adaptive_reader")
@@ -125,9 +127,11 @@ class AdaptiveReader:
         
         return closest_level
     
-    def simplify_chunk(self, text: str, factor: float) -> str:
+    def simplify_chunk(self, text: str, factor: float, strict: bool = False) -> str:
         """
         Simplify text using Gemini API with explicit simplification instructions.
+        Falls back to the original text on API errors unless strict is True,
+        in which case the error is raised to the caller.
         """
         # Ensure factor is valid and rounded to nearest 10%
         factor = min(0.7, max(0, factor))
@@ -188,23 +192,47 @@ class AdaptiveReader:
                     return simplified
             
             logger.error(f"Unexpected API response format: {data}")
+            if strict:
+                raise ValueError("Unexpected API response format")
             return text  # Return original as fallback
             
         except Exception as e:
             logger.error(f"Error during simplification: {str(e)}")
+            if strict:
+                raise
             return text  # Return original as fallback
 
 # Command line interface for direct simplification
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Adaptive Reader Text Processing")
-    parser.add_argument("--simplify-text", action="store_true", help="Simplify the provided text")
-    parser.add_argument("--input-file", type=str, help="JSON file with text and factor")
+    parser.add_argument("--simplify-text", action="store_true", help="Simplify the provided text (implied by --bulk)")
+    parser.add_argument("--input-file", type=str, help="JSON file with text and factor (JSONL of them with --bulk)")
     parser.add_argument("--text", type=str, help="Text to simplify")
     parser.add_argument("--factor", type=float, default=0.2, help="Simplification factor (0.0-0.7)")
+    add_bulk_arguments(parser)
     
     args = parser.parse_args()
     
-    if args.simplify_text:
+    if args.bulk:
+        # simplify_chunk keeps no per-call state, so one reader serves every worker.
+        # strict=True so failed API calls are reported per record instead of
+        # silently returning the unsimplified text.
+        reader = AdaptiveReader()
+        
+        def simplify_record(record: Dict[str, Any]) -> Dict[str, Any]:
+            text = record.get('text', '')
+            factor = record.get('factor', args.factor)
+            if not text:
+                raise ValueError("No text provided in record")
+            return {
+                "simplified_text": reader.simplify_chunk(text, factor, strict=True),
+                "factor": factor
+            }
+        
+        failures = run_bulk(simplify_record, args.input_file, args.output_file, args.workers, args.ordered)
+        sys.exit(1 if failures else 0)
+    
+    elif args.simplify_text:
         # Initialize the reader
         reader = AdaptiveReader()
         
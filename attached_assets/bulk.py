@@ -0,0 +1,133 @@
+import argparse
+import contextlib
+import json
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, IO, Iterator, Optional, Tuple
+
+logger = logging.getLogger("bulk")
+
+# Default number of records processed concurrently in bulk mode
+DEFAULT_WORKERS = 8
+
+
+def add_bulk_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    Register the shared bulk-mode flags on a module's CLI parser.
+    """
+    parser.add_argument("--bulk", action="store_true",
+                        help="Process JSONL records from --input-file (or stdin) and write JSONL results")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Number of records processed concurrently in bulk mode (default {DEFAULT_WORKERS})")
+    parser.add_argument("--ordered", action="store_true",
+                        help="Emit bulk results in input order instead of as they finish")
+    parser.add_argument("--output-file", type=str,
+                        help="Write bulk results to this file instead of stdout")
+
+
+def _read_records(stream: IO[str]) -> Iterator[Tuple[int, Any, Optional[Dict[str, Any]], Optional[str]]]:
+    """
+    Yield (seq, record_id, record, parse_error) for each non-blank JSONL line.
+    Records without an "id" field are identified by their line number.
+    """
+    seq = 0
+    for line_no, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError("Record must be a JSON object")
+        except ValueError as e:
+            yield seq, line_no, None, f"Invalid JSON on line {line_no}: {e}"
+        else:
+            yield seq, record.get("id", line_no), record, None
+        seq += 1
+
+
+def _process(handler: Callable[[Dict[str, Any]], Any], record_id: Any,
+             record: Optional[Dict[str, Any]], parse_error: Optional[str]) -> Dict[str, Any]:
+    """
+    Run the handler on one record, capturing its result or error and timing.
+    """
+    start = time.perf_counter()
+    result = None
+    error = parse_error
+    if error is None:
+        try:
+            result = handler(record)
+        except Exception as e:
+            logger.error(f"Record {record_id} failed: {str(e)}")
+            error = str(e)
+    return {
+        "id": record_id,
+        "ok": error is None,
+        "result": result,
+        "error": error,
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+    }
+
+
+def run_bulk(
+    handler: Callable[[Dict[str, Any]], Any],
+    input_file: Optional[str] = None,
+    output_file: Optional[str] = None,
+    workers: int = DEFAULT_WORKERS,
+    ordered: bool = False
+) -> int:
+    """
+    Read JSONL records from input_file (stdin if None or "-"), run handler on each
+    with up to `workers` records in flight, and write one JSONL result per record
+    to output_file (stdout if None) as soon as it is available.
+    Returns the number of records that failed.
+    """
+    workers = max(1, workers)
+    in_stream = sys.stdin if input_file in (None, "-") else open(input_file, "r")
+    out_stream = sys.stdout if output_file is None else open(output_file, "w")
+    failures = 0
+
+    def emit(row: Dict[str, Any]) -> None:
+        nonlocal failures
+        if not row["ok"]:
+            failures += 1
+        out_stream.write(json.dumps(row) + "\n")
+        out_stream.flush()
+
+    # The API helpers print diagnostics to stdout; keep them out of the JSONL stream
+    try:
+        with contextlib.redirect_stdout(sys.stderr), ThreadPoolExecutor(max_workers=workers) as pool:
+            in_flight = {}
+            finished = {}
+            next_seq = 0
+
+            def drain(block: bool) -> None:
+                nonlocal next_seq
+                done, _ = wait(in_flight, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+                for future in done:
+                    seq = in_flight.pop(future)
+                    if ordered:
+                        finished[seq] = future.result()
+                    else:
+                        emit(future.result())
+                while next_seq in finished:
+                    emit(finished.pop(next_seq))
+                    next_seq += 1
+
+            # Bound the number of queued records so large libraries stream rather than load
+            for seq, record_id, record, parse_error in _read_records(in_stream):
+                while len(in_flight) + len(finished) >= workers * 2:
+                    drain(block=True)
+                in_flight[pool.submit(_process, handler, record_id, record, parse_error)] = seq
+                drain(block=False)
+            while in_flight:
+                drain(block=True)
+    finally:
+        if in_stream is not sys.stdin:
+            in_stream.close()
+        if out_stream is not sys.stdout:
+            out_stream.close()
+
+    logger.info(f"Bulk run finished with {failures} failed record(s)")
+    return failures
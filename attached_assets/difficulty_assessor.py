@@ -1,7 +1,12 @@
 import requests
 import json
 import re
-from typing import Union, Optional
+import sys
+import math
+import argparse
+from typing import Any, Dict, Union, Optional
+
+from bulk import add_bulk_arguments, run_bulk
 
 # Gemini 2.0 Flash API configuration
 import os
@@ -59,7 +64,34 @@ def rate_chunk_difficulty(
     return score
 
 
+def _assess_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Bulk-mode handler: rates record["chunk"] and returns {"score": ...}.
+    """
+    chunk = record.get("chunk", "")
+    if not chunk:
+        raise ValueError("No chunk provided in record")
+    score = rate_chunk_difficulty(
+        chunk,
+        min_score=record.get("min_score", 0),
+        max_score=record.get("max_score", 2000)
+    )
+    # json.loads accepts true/false and NaN/Infinity, none of which are usable scores
+    if isinstance(score, bool) or not isinstance(score, (int, float)) or not math.isfinite(score):
+        raise ValueError("Could not parse a difficulty score from Gemini")
+    return {"score": score}
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chunk difficulty assessment")
+    parser.add_argument("--input-file", type=str, help="JSONL file of {\"chunk\": ...} records (stdin if omitted)")
+    add_bulk_arguments(parser)
+    args = parser.parse_args()
+
+    if args.bulk:
+        failures = run_bulk(_assess_record, args.input_file, args.output_file, args.workers, args.ordered)
+        sys.exit(1 if failures else 0)
+
     demo_chunk = (
         "In engineering, voltage dividers are circuits with two resistors in series. "
         "They split the input voltage in proportion to resistor values, allowing designers "
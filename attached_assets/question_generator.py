@@ -1,6 +1,10 @@
 import requests
 import json
-from typing import List, Optional
+import sys
+import argparse
+from typing import Any, Dict, List, Optional
+
+from bulk import add_bulk_arguments, run_bulk
 
 # Gemini 2.0 Flash API configuration
 import os
@@ -13,11 +17,14 @@ def generate_questions_from_chunk(
     min_questions: int = 2,
     max_questions: int = 5,
     temperature: float = 0.7,
-    max_output_tokens: int = 256
+    max_output_tokens: int = 256,
+    strict: bool = False
 ) -> List[str]:
     """
     Send a text chunk to Gemini 2.0 Flash and generate open-ended questions.
-    Returns a list of questions as strings.
+    Returns a list of questions as strings. With strict=True the output must be a
+    non-empty JSON array of strings (markdown fences allowed), otherwise
+    ValueError is raised instead of falling back to splitting lines.
     """
     headers = {"Content-Type": "application/json"}
     prompt_text = (
@@ -49,6 +56,20 @@ def generate_questions_from_chunk(
     else:
         output = first.get("output", "")
 
+    if strict:
+        # Clean fences
+        text = output.strip().strip('`').strip()
+        if text.startswith("json"):
+            text = text[4:].strip()
+        try:
+            questions = json.loads(text)
+        except json.JSONDecodeError:
+            raise ValueError("Could not parse a JSON array of questions from Gemini")
+        if (not isinstance(questions, list) or not questions
+                or not all(isinstance(q, str) and q.strip() for q in questions)):
+            raise ValueError("Gemini did not return a non-empty list of questions")
+        return questions
+
     try:
         questions = json.loads(output)
     except json.JSONDecodeError:
@@ -61,7 +82,32 @@ def generate_questions_from_chunk(
     return questions
 
 
+def _generate_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Bulk-mode handler: generates questions for record["chunk"] and returns {"questions": [...]}.
+    """
+    chunk = record.get("chunk", "")
+    if not chunk:
+        raise ValueError("No chunk provided in record")
+    questions = generate_questions_from_chunk(
+        chunk,
+        min_questions=record.get("min_questions", 2),
+        max_questions=record.get("max_questions", 5),
+        strict=True
+    )
+    return {"questions": questions}
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Question generation")
+    parser.add_argument("--input-file", type=str, help="JSONL file of {\"chunk\": ...} records (stdin if omitted)")
+    add_bulk_arguments(parser)
+    args = parser.parse_args()
+
+    if args.bulk:
+        failures = run_bulk(_generate_record, args.input_file, args.output_file, args.workers, args.ordered)
+        sys.exit(1 if failures else 0)
+
     demo_chunk = (
         "In engineering, voltage dividers are circuits with two resistors in series. "
         "They split the input voltage in proportion to resistor values, allowing designers "
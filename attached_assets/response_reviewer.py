@@ -1,7 +1,13 @@
 import requests
 import json
 import re
-from typing import List, Dict, Any, Optional
+import sys
+import argparse
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+
+from bulk import add_bulk_arguments, run_bulk
 
 # Gemini 2.0 Flash API configuration
 import os
@@ -10,24 +16,28 @@ API_URL = (
     f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={GEMINI_API_KEY}"
 )
 
+# Maximum number of individual re-grades run concurrently when batch output is incomplete
+FALLBACK_WORKERS = 8
 
-def review_responses(
-    chunk: str,
-    questions: List[str],
-    responses: List[str],
-    temperature: float = 0.3,
-    max_output_tokens: int = 512
-) -> Optional[Dict[str, Any]]:
+# Maximum learners graded in one batched request; at 256 output tokens per learner
+# this stays under gemini-2.0-flash's output token limit
+MAX_BATCH_SIZE = 30
+MAX_OUTPUT_TOKENS = 8192
+
+RATING_GUIDELINES = (
+    "IMPORTANT RATING GUIDELINES:\n"
+    "- For complete, accurate answers: rate 50 to 200 (higher for exceptional answers)\n"
+    "- For partially correct but incomplete answers: rate -50 to 50\n"
+    "- For very short, clearly incorrect, or minimal effort answers (like one-word responses): rate -200 to -100\n"
+    "- BE VERY STRICT with short, low-effort answers - they should get strongly negative ratings\n"
+)
+
+
+def _review_short_responses(responses: List[str]) -> Optional[Dict[str, Any]]:
     """
-    Sends the text chunk, questions, and their responses to Gemini 2.0 Flash.
-    Returns a dict with keys: 'review' (str) and 'rating' (int).
-    
-    NEW: Automatically gives very negative ratings for very short answers
-    without even sending to the API.
+    Returns a canned negative review for very short answers, or None if the
+    responses need to be graded by Gemini.
     """
-    if len(questions) != len(responses):
-        raise ValueError("Questions and responses lists must be the same length")
-    
     # Check for very short responses - automatically give negative ratings
     # This is to ensure we always simplify after poor answers
     all_responses_text = " ".join(responses)
@@ -43,6 +53,29 @@ def review_responses(
             "review": "Your answers are too brief. Please explain your understanding in more detail.",
             "rating": -100
         }
+    return None
+
+
+def review_responses(
+    chunk: str,
+    questions: List[str],
+    responses: List[str],
+    temperature: float = 0.3,
+    max_output_tokens: int = 512
+) -> Optional[Dict[str, Any]]:
+    """
+    Sends the text chunk, questions, and their responses to Gemini 2.0 Flash.
+    Returns a dict with keys: 'review' (str) and 'rating' (int).
+    
+    NEW: Automatically gives very negative ratings for very short answers
+    without even sending to the API.
+    """
+    if len(questions) != len(responses):
+        raise ValueError("Questions and responses lists must be the same length")
+    
+    short_review = _review_short_responses(responses)
+    if short_review is not None:
+        return short_review
 
     # Build prompt
     prompt = [chunk, "\n"]
@@ -50,11 +83,7 @@ def review_responses(
         prompt.append(f"Question {idx}: {q}\nResponse: {r}\n")
     prompt.append(
         "\nGenerate a JSON object with two keys: 'review' (a short evaluation message for the learner) "
-        "and 'rating' (integer between -200 and 200). IMPORTANT RATING GUIDELINES:\n"
-        "- For complete, accurate answers: rate 50 to 200 (higher for exceptional answers)\n"
-        "- For partially correct but incomplete answers: rate -50 to 50\n"
-        "- For very short, clearly incorrect, or minimal effort answers (like one-word responses): rate -200 to -100\n"
-        "- BE VERY STRICT with short, low-effort answers - they should get strongly negative ratings\n"
+        "and 'rating' (integer between -200 and 200). " + RATING_GUIDELINES +
         "Respond with only the JSON object."
     )
     prompt_text = "".join(prompt)
@@ -107,7 +136,337 @@ def review_responses(
         return None
 
 
+def _request_batch(
+    chunk: str,
+    questions: List[str],
+    response_sets: List[List[str]],
+    indices: List[int],
+    temperature: float,
+    max_output_tokens_per_learner: int
+) -> Dict[int, Dict[str, Any]]:
+    """
+    Grades response_sets[i] for every i in indices with one Gemini request and
+    returns {i: review dict} for the entries that came back well-formed.
+    Request errors (HTTP status, connection, timeout) are raised; unparseable
+    output simply leaves entries out of the returned dict.
+    """
+    # Build prompt: shared context once, then each learner's answers under a 1-based learner number
+    prompt = [chunk, "\n"]
+    for idx, q in enumerate(questions, 1):
+        prompt.append(f"Question {idx}: {q}\n")
+    for learner, set_idx in enumerate(indices, 1):
+        prompt.append(f"\nLearner {learner}:\n")
+        for idx, r in enumerate(response_sets[set_idx], 1):
+            prompt.append(f"Response {idx}: {r}\n")
+    prompt.append(
+        f"\nGrade each of the {len(indices)} learners independently. Generate a JSON array with one object "
+        "per learner, each with three keys: 'learner' (the learner number), 'review' (a short evaluation "
+        "message for that learner) and 'rating' (integer between -200 and 200). " + RATING_GUIDELINES +
+        "Respond with only the JSON array."
+    )
+    prompt_text = "".join(prompt)
+
+    payload = {
+        "contents": [{"parts": [{"text": prompt_text}]}],
+        "generationConfig": {
+            "temperature": temperature,
+            "maxOutputTokens": min(MAX_OUTPUT_TOKENS, max_output_tokens_per_learner * len(indices)),
+            "responseMimeType": "application/json"
+        }
+    }
+
+    response = requests.post(API_URL, headers={"Content-Type": "application/json"}, json=payload)
+    try:
+        response.raise_for_status()
+    except requests.HTTPError:
+        print(f"Gemini API error ({response.status_code}): {response.text}")
+        raise
+
+    try:
+        data = response.json()
+    except ValueError:
+        print("Could not parse Gemini batch response body:", response.text)
+        return {}
+    candidate = (data.get("candidates") or [{}])[0]
+    # Extract text
+    if "content" in candidate:
+        parts = candidate["content"].get("parts", [])
+        output = "".join(p.get("text", "") for p in parts)
+    else:
+        output = candidate.get("output", "")
+
+    # Clean fences
+    text = output.strip().strip('`').strip()
+    if text.startswith("json"):
+        text = text[4:].strip()
+    try:
+        entries = json.loads(text)
+    except json.JSONDecodeError:
+        m_text = re.search(r"\[.*\]", text, flags=re.DOTALL)
+        try:
+            entries = json.loads(m_text.group()) if m_text else []
+        except json.JSONDecodeError:
+            entries = []
+    if not isinstance(entries, list):
+        entries = []
+
+    graded: Dict[int, Dict[str, Any]] = {}
+    duplicates = set()
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        learner = entry.get("learner")
+        review = entry.get("review")
+        rating = entry.get("rating")
+        if (isinstance(learner, bool) or not isinstance(learner, int) or not 1 <= learner <= len(indices)
+                or not isinstance(review, str)
+                or isinstance(rating, bool) or not isinstance(rating, (int, float))):
+            continue
+        # NaN and Infinity parse as floats but cannot be converted; treat them as malformed
+        try:
+            score = int(rating)
+        except (ValueError, OverflowError):
+            continue
+        set_idx = indices[learner - 1]
+        # A learner graded twice is ambiguous; leave it for individual grading
+        if set_idx in graded:
+            duplicates.add(set_idx)
+            continue
+        # clamp rating between -200 and 200
+        graded[set_idx] = {"review": review, "rating": max(-200, min(200, score))}
+    for set_idx in duplicates:
+        del graded[set_idx]
+    return graded
+
+
+def _grade_batch(
+    chunk: str,
+    questions: List[str],
+    response_sets: List[List[str]],
+    temperature: float = 0.3,
+    max_output_tokens_per_learner: int = 256
+) -> Tuple[List[Optional[Dict[str, Any]]], List[int], Dict[int, Exception]]:
+    """
+    Applies the short-answer checks, then grades the remaining response sets in
+    batched Gemini requests of at most MAX_BATCH_SIZE learners each.
+    Returns (results, missing, failed): missing lists the indices whose entries
+    were absent or malformed in the batch output and need individual grading;
+    failed maps indices to the error of a batch request that failed outright.
+    Failed requests are not retried per learner, so a rate-limited batch does
+    not turn into one request per learner.
+    """
+    for responses in response_sets:
+        if len(questions) != len(responses):
+            raise ValueError("Questions and responses lists must be the same length")
+
+    results: List[Optional[Dict[str, Any]]] = [_review_short_responses(r) for r in response_sets]
+    pending = [i for i, result in enumerate(results) if result is None]
+    missing: List[int] = []
+    failed: Dict[int, Exception] = {}
+    for start in range(0, len(pending), MAX_BATCH_SIZE):
+        group = pending[start:start + MAX_BATCH_SIZE]
+        # A batch of one saves nothing over review_responses
+        if len(group) == 1:
+            missing.extend(group)
+            continue
+        try:
+            graded = _request_batch(chunk, questions, response_sets, group, temperature,
+                                    max_output_tokens_per_learner)
+        except requests.RequestException as e:
+            print(f"Batch review request failed for {len(group)} learner(s): {str(e)}")
+            failed.update((set_idx, e) for set_idx in group)
+            continue
+        for set_idx in group:
+            if set_idx in graded:
+                results[set_idx] = graded[set_idx]
+            else:
+                missing.append(set_idx)
+
+    if len(missing) > 1:
+        print(f"Batch review missing entries for {len(missing)} learner(s); grading individually")
+    return results, missing, failed
+
+
+def review_responses_batch(
+    chunk: str,
+    questions: List[str],
+    response_sets: List[List[str]],
+    temperature: float = 0.3,
+    max_output_tokens_per_learner: int = 256
+) -> List[Optional[Dict[str, Any]]]:
+    """
+    Grades many learners' responses to the same chunk and questions, sending the
+    chunk and questions once per request of up to MAX_BATCH_SIZE learners.
+    Returns one review dict (or None) per response set, in the same order.
+    Learners whose entry is missing or malformed in the batch output are
+    re-graded individually with review_responses, up to FALLBACK_WORKERS at a
+    time. Failures stay per learner: if a batch request fails (e.g. HTTP 429 or
+    5xx) its learners are not retried and get None, and a learner whose
+    individual re-grade raises also gets None. Errors are printed.
+    """
+    results, missing, failed = _grade_batch(chunk, questions, response_sets, temperature,
+                                            max_output_tokens_per_learner)
+
+    def regrade(set_idx: int) -> Optional[Dict[str, Any]]:
+        try:
+            return review_responses(chunk, questions, response_sets[set_idx], temperature=temperature)
+        except Exception as e:
+            print(f"Individual review failed for response set {set_idx}: {str(e)}")
+            return None
+
+    if missing:
+        with ThreadPoolExecutor(max_workers=min(FALLBACK_WORKERS, len(missing))) as pool:
+            for set_idx, result in zip(missing, pool.map(regrade, missing)):
+                results[set_idx] = result
+    return results
+
+
+class ReviewBatcher:
+    """
+    Collects concurrent review submissions for the same chunk and questions over
+    a short window and grades them together with one batched Gemini request.
+    Only long-lived callers that handle many learners in one process benefit;
+    the server currently starts a separate reviewer process per learner.
+    Call close() (or use the batcher as a context manager) before exiting so
+    batches still inside their window are graded.
+    """
+    def __init__(self, window: float = 0.5, max_batch_size: int = MAX_BATCH_SIZE,
+                 max_workers: int = FALLBACK_WORKERS):
+        self.window = window
+        self.max_batch_size = max(1, min(max_batch_size, MAX_BATCH_SIZE))
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._pending: Dict[Tuple[str, Tuple[str, ...]], List[Tuple[List[str], Future]]] = {}
+        self._timers: Dict[Tuple[str, Tuple[str, ...]], threading.Timer] = {}
+        self._closed = False
+
+    def __enter__(self) -> "ReviewBatcher":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def submit(self, chunk: str, questions: List[str], responses: List[str]) -> Future:
+        """
+        Queue one learner's responses for grading without blocking. Returns a
+        Future that resolves to the same dict (or None) review_responses would
+        return, as soon as that learner's grade is available, or raises the
+        error of the request that failed for that learner.
+        """
+        if len(questions) != len(responses):
+            raise ValueError("Questions and responses lists must be the same length")
+
+        key = (chunk, tuple(questions))
+        future: Future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("ReviewBatcher is closed")
+            batch = self._pending.setdefault(key, [])
+            batch.append((list(responses), future))
+            if len(batch) >= self.max_batch_size:
+                # Full batch: grade it now on the executor and drop its window timer
+                del self._pending[key]
+                timer = self._timers.pop(key, None)
+                if timer is not None:
+                    timer.cancel()
+                self._executor.submit(self._grade, key, batch)
+            elif len(batch) == 1:
+                timer = threading.Timer(self.window, self._flush, args=(key, batch))
+                timer.daemon = True
+                self._timers[key] = timer
+                timer.start()
+        return future
+
+    def review(self, chunk: str, questions: List[str], responses: List[str]) -> Optional[Dict[str, Any]]:
+        """
+        Blocking variant of submit for callers handling one learner per thread.
+        """
+        return self.submit(chunk, questions, responses).result()
+
+    def close(self) -> None:
+        """
+        Grades every batch still waiting for its window, waits for all grading
+        to finish and shuts down the executor. Later submits raise RuntimeError.
+        """
+        with self._lock:
+            self._closed = True
+            for key, batch in self._pending.items():
+                timer = self._timers.pop(key, None)
+                if timer is not None:
+                    timer.cancel()
+                self._executor.submit(self._grade, key, batch)
+            self._pending.clear()
+        self._executor.shutdown(wait=True)
+
+    def _flush(self, key: Tuple[str, Tuple[str, ...]], batch: List[Tuple[List[str], Future]]) -> None:
+        with self._lock:
+            # The batch may already have been handed off when it filled up or on close
+            if self._pending.get(key) is not batch:
+                return
+            del self._pending[key]
+            self._timers.pop(key, None)
+            # Submit under the lock so close() cannot shut the executor down in between
+            self._executor.submit(self._grade, key, batch)
+
+    def _grade(self, key: Tuple[str, Tuple[str, ...]], batch: List[Tuple[List[str], Future]]) -> None:
+        # Drop learners whose Future was cancelled; the rest can no longer be cancelled
+        batch = [(responses, future) for responses, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        chunk, questions = key
+        try:
+            results, missing, failed = _grade_batch(chunk, list(questions), [responses for responses, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        missing_set = set(missing)
+        for set_idx, ((_, future), result) in enumerate(zip(batch, results)):
+            if set_idx in failed:
+                future.set_exception(failed[set_idx])
+            elif set_idx not in missing_set:
+                future.set_result(result)
+        # Each re-graded learner's Future resolves as soon as its own grade arrives
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(FALLBACK_WORKERS, len(missing))) as pool:
+                for set_idx in missing:
+                    responses, future = batch[set_idx]
+                    pool.submit(self._grade_one, chunk, list(questions), responses, future)
+
+    def _grade_one(self, chunk: str, questions: List[str], responses: List[str], future: Future) -> None:
+        try:
+            future.set_result(review_responses(chunk, questions, responses))
+        except Exception as e:
+            future.set_exception(e)
+
+
+def _review_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Bulk-mode handler: reviews record["responses"] to record["questions"] about record["chunk"].
+    """
+    review = review_responses(
+        record.get("chunk", ""),
+        record.get("questions", []),
+        record.get("responses", [])
+    )
+    if review is None:
+        raise ValueError("Could not parse JSON response from Gemini")
+    return review
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Response review")
+    parser.add_argument("--input-file", type=str,
+                        help="JSONL file of {\"chunk\", \"questions\", \"responses\"} records (stdin if omitted)")
+    add_bulk_arguments(parser)
+    args = parser.parse_args()
+
+    if args.bulk:
+        failures = run_bulk(_review_record, args.input_file, args.output_file, args.workers, args.ordered)
+        sys.exit(1 if failures else 0)
+
     demo_chunk = (
         "In engineering, voltage dividers are circuits with two resistors in series. "
         "They split the input voltage in proportion to resistor values."
@@ -0,0 +1,201 @@
+import json
+import re
+import threading
+import time
+import unittest
+from unittest import mock
+
+import requests
+
+import response_reviewer
+from response_reviewer import MAX_BATCH_SIZE, MAX_OUTPUT_TOKENS, ReviewBatcher, review_responses_batch
+
+CHUNK = "Voltage dividers are circuits with two resistors in series."
+QUESTIONS = ["What does a voltage divider do?", "Why use two resistors in series?"]
+ANSWERS = ["It splits the input voltage proportionally.", "So the output is a fixed fraction of the input."]
+
+
+def _reply(text, status_code=200):
+    """
+    Fake requests.Response carrying `text` as Gemini's generated output.
+    """
+    response = mock.Mock(status_code=status_code, text=text)
+    if status_code >= 400:
+        response.raise_for_status.side_effect = requests.HTTPError(f"{status_code} Error")
+    response.json.return_value = {"candidates": [{"content": {"parts": [{"text": text}]}}]}
+    return response
+
+
+def _is_batch(payload):
+    return "responseMimeType" in payload["generationConfig"]
+
+
+def _learner_count(payload):
+    return len(re.findall(r"^Learner \d+:", payload["contents"][0]["parts"][0]["text"], flags=re.MULTILINE))
+
+
+def _grade_all(payload, rating=100):
+    """
+    Well-formed batch output grading every learner in the prompt.
+    """
+    entries = [{"learner": n, "review": f"learner {n}", "rating": rating}
+               for n in range(1, _learner_count(payload) + 1)]
+    return _reply(json.dumps(entries))
+
+
+INDIVIDUAL = _reply('{"review": "individual", "rating": 10}')
+
+
+class ReviewResponsesBatchTest(unittest.TestCase):
+    def test_parses_and_clamps_entries(self):
+        batch_output = (
+            '[{"learner": 1, "review": "great", "rating": 999},'
+            ' {"learner": 2, "review": "poor", "rating": -999},'
+            ' {"learner": 3, "review": "ok", "rating": 42.7}]'
+        )
+        with mock.patch.object(response_reviewer.requests, "post", return_value=_reply(batch_output)) as post:
+            results = review_responses_batch(CHUNK, QUESTIONS, [ANSWERS] * 3)
+        self.assertEqual(post.call_count, 1)
+        self.assertEqual(results, [
+            {"review": "great", "rating": 200},
+            {"review": "poor", "rating": -200},
+            {"review": "ok", "rating": 42},
+        ])
+
+    def test_malformed_entries_fall_back_individually(self):
+        # learner 2 has a NaN rating, learner 3 is missing, learner 4 is graded twice
+        batch_output = (
+            '[{"learner": 1, "review": "good", "rating": 50},'
+            ' {"learner": 2, "review": "nan", "rating": NaN},'
+            ' {"learner": 4, "review": "first", "rating": 20},'
+            ' {"learner": 4, "review": "second", "rating": 30},'
+            ' {"learner": 5, "review": "inf", "rating": Infinity}]'
+        )
+
+        def post(url, headers=None, json=None):
+            return _reply(batch_output) if _is_batch(json) else INDIVIDUAL
+
+        with mock.patch.object(response_reviewer.requests, "post", side_effect=post) as fake_post:
+            results = review_responses_batch(CHUNK, QUESTIONS, [ANSWERS] * 5)
+        self.assertEqual(results[0], {"review": "good", "rating": 50})
+        self.assertEqual(results[1:], [{"review": "individual", "rating": 10}] * 4)
+        self.assertEqual(fake_post.call_count, 5)
+
+    def test_unparseable_output_falls_back_individually(self):
+        def post(url, headers=None, json=None):
+            return _reply('[{"learner": 1, "review": "trunc') if _is_batch(json) else INDIVIDUAL
+
+        with mock.patch.object(response_reviewer.requests, "post", side_effect=post):
+            results = review_responses_batch(CHUNK, QUESTIONS, [ANSWERS] * 3)
+        self.assertEqual(results, [{"review": "individual", "rating": 10}] * 3)
+
+    def test_failed_batch_request_is_not_retried_per_learner(self):
+        with mock.patch.object(response_reviewer.requests, "post", return_value=_reply("quota", 429)) as post:
+            results = review_responses_batch(CHUNK, QUESTIONS, [ANSWERS] * 10)
+        self.assertEqual(post.call_count, 1)
+        self.assertEqual(results, [None] * 10)
+
+    def test_failed_individual_regrade_keeps_batch_grades(self):
+        def post(url, headers=None, json=None):
+            if _is_batch(json):
+                return _reply('[{"learner": 1, "review": "good", "rating": 80}]')
+            return _reply("quota", 429)
+
+        with mock.patch.object(response_reviewer.requests, "post", side_effect=post):
+            results = review_responses_batch(CHUNK, QUESTIONS, [ANSWERS] * 3)
+        self.assertEqual(results, [{"review": "good", "rating": 80}, None, None])
+
+    def test_short_answers_are_not_sent(self):
+        with mock.patch.object(response_reviewer.requests, "post", side_effect=lambda url, headers=None, json=None:
+                               _grade_all(json)) as post:
+            results = review_responses_batch(CHUNK, QUESTIONS, [ANSWERS, ["idk", ""], ANSWERS])
+        self.assertEqual(post.call_count, 1)
+        self.assertEqual(_learner_count(post.call_args.kwargs["json"]), 2)
+        self.assertEqual(results[1]["rating"], -150)
+        self.assertEqual([results[0]["rating"], results[2]["rating"]], [100, 100])
+
+    def test_large_classes_are_split_into_capped_requests(self):
+        with mock.patch.object(response_reviewer.requests, "post", side_effect=lambda url, headers=None, json=None:
+                               _grade_all(json)) as post:
+            results = review_responses_batch(CHUNK, QUESTIONS, [ANSWERS] * 65)
+        payloads = [call.kwargs["json"] for call in post.call_args_list]
+        self.assertEqual([_learner_count(p) for p in payloads], [MAX_BATCH_SIZE, MAX_BATCH_SIZE, 5])
+        self.assertTrue(all(p["generationConfig"]["maxOutputTokens"] <= MAX_OUTPUT_TOKENS for p in payloads))
+        self.assertTrue(all(r == {"review": r["review"], "rating": 100} for r in results))
+
+    def test_mismatched_responses_raise(self):
+        with self.assertRaises(ValueError):
+            review_responses_batch(CHUNK, QUESTIONS, [ANSWERS, ANSWERS[:1]])
+
+
+class ReviewBatcherTest(unittest.TestCase):
+    def test_window_groups_submissions_into_one_request(self):
+        with mock.patch.object(response_reviewer.requests, "post", side_effect=lambda url, headers=None, json=None:
+                               _grade_all(json)) as post:
+            with ReviewBatcher(window=0.1) as batcher:
+                futures = [batcher.submit(CHUNK, QUESTIONS, ANSWERS) for _ in range(3)]
+                results = [f.result(timeout=2) for f in futures]
+        self.assertEqual(post.call_count, 1)
+        self.assertEqual([r["review"] for r in results], ["learner 1", "learner 2", "learner 3"])
+
+    def test_full_batch_does_not_block_submit(self):
+        def slow_post(url, headers=None, json=None):
+            time.sleep(0.5)
+            return _grade_all(json)
+
+        with mock.patch.object(response_reviewer.requests, "post", side_effect=slow_post) as post:
+            with ReviewBatcher(window=60, max_batch_size=2) as batcher:
+                started = time.perf_counter()
+                futures = [batcher.submit(CHUNK, QUESTIONS, ANSWERS) for _ in range(2)]
+                self.assertLess(time.perf_counter() - started, 0.2)
+                self.assertEqual([f.result(timeout=2)["rating"] for f in futures], [100, 100])
+        self.assertEqual(post.call_count, 1)
+
+    def test_cancelled_future_does_not_block_others(self):
+        with mock.patch.object(response_reviewer.requests, "post", side_effect=lambda url, headers=None, json=None:
+                               _grade_all(json)):
+            with ReviewBatcher(window=0.1) as batcher:
+                cancelled = batcher.submit(CHUNK, QUESTIONS, ANSWERS)
+                kept = [batcher.submit(CHUNK, QUESTIONS, ANSWERS) for _ in range(2)]
+                self.assertTrue(cancelled.cancel())
+                self.assertEqual([f.result(timeout=2)["rating"] for f in kept], [100, 100])
+
+    def test_failed_batch_request_sets_exception_per_learner(self):
+        with mock.patch.object(response_reviewer.requests, "post", return_value=_reply("quota", 429)) as post:
+            with ReviewBatcher(window=0.1) as batcher:
+                futures = [batcher.submit(CHUNK, QUESTIONS, ANSWERS) for _ in range(3)]
+                for future in futures:
+                    self.assertIsInstance(future.exception(timeout=2), requests.HTTPError)
+        self.assertEqual(post.call_count, 1)
+
+    def test_close_grades_pending_batches(self):
+        with mock.patch.object(response_reviewer.requests, "post", side_effect=lambda url, headers=None, json=None:
+                               _grade_all(json)):
+            batcher = ReviewBatcher(window=60)
+            futures = [batcher.submit(CHUNK, QUESTIONS, ANSWERS) for _ in range(2)]
+            batcher.close()
+        self.assertTrue(all(f.done() for f in futures))
+        self.assertEqual([f.result()["rating"] for f in futures], [100, 100])
+        with self.assertRaises(RuntimeError):
+            batcher.submit(CHUNK, QUESTIONS, ANSWERS)
+
+    def test_regrades_resolve_independently(self):
+        release = threading.Event()
+
+        def post(url, headers=None, json=None):
+            if _is_batch(json):
+                return _reply('[{"learner": 1, "review": "good", "rating": 80}]')
+            release.wait(2)
+            return INDIVIDUAL
+
+        with mock.patch.object(response_reviewer.requests, "post", side_effect=post):
+            with ReviewBatcher(window=0.1) as batcher:
+                graded, regraded = [batcher.submit(CHUNK, QUESTIONS, ANSWERS) for _ in range(2)]
+                self.assertEqual(graded.result(timeout=2)["rating"], 80)
+                self.assertFalse(regraded.done())
+                release.set()
+                self.assertEqual(regraded.result(timeout=2)["rating"], 10)
+
+
+if __name__ == "__main__":
+    unittest.main()